@@ -0,0 +1,150 @@
+# bench_startup.py (benchmark di avvio a freddo)
+#
+# Misura:
+#   1. il tempo di import di main.py in un processo pulito;
+#   2. il tempo da lancio di main.py al primo BPM inoltrato a Resolume;
+#   3. il tempo da lancio di main.py alla prima ricerca copertina, che passa
+#      dal loop eventi Qt del thread principale (se è bloccato non arriva mai).
+# Esce con codice 1 se uno dei tre supera il budget, così le regressioni
+# sull'avvio (import pesanti, UI costruita prima dell'OSC, loop Qt bloccato, ...)
+# vengono notate.
+#
+# Uso: python bench_startup.py [--import-budget 0.5] [--forward-budget 0.3]
+#                              [--live-budget 0.5] [--runs 3]
+
+import argparse
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from pythonosc.udp_client import SimpleUDPClient
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(ROOT, "main.py")
+# Stampato dal worker avviato da CoverDownloader.download_cover, slot del thread principale
+LIVENESS_MARKER = "Ricerca su iTunes per:"
+
+
+def free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import():
+    """Tempo (s) per 'import main' in un interprete nuovo, al netto dell'avvio di Python."""
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        return time.perf_counter() - start
+    baseline = run("pass")
+    return max(0.0, run("import main") - baseline)
+
+
+def measure_startup(timeout=10.0):
+    """
+    Lancia main.py e restituisce (s) i tempi di:
+    - primo messaggio ricevuto sulla porta di Resolume;
+    - prima ricerca copertina dopo l'invio di titolo e artista (loop Qt vivo).
+    """
+    osc_port = free_udp_port()
+    resolume = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    resolume.bind(("127.0.0.1", 0))
+    resolume.settimeout(0.01)
+    resolume_port = resolume.getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "config.ini"), "w") as f:
+            f.write(
+                "[osc]\n"
+                "ip = 127.0.0.1\n"
+                f"port = {osc_port}\n"
+                "resolume_ip = 127.0.0.1\n"
+                f"resolume_port = {resolume_port}\n"
+                # Senza finestra di aggregazione si misura solo l'avvio
+                "tag_window_ms = 0\n"
+                "[artwork]\n"
+                "http_enabled = 0\n"
+            )
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONUNBUFFERED="1")
+        client = SimpleUDPClient("127.0.0.1", osc_port)
+
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, MAIN], cwd=workdir, env=env, text=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        lines = queue.Queue()
+
+        def read_stdout():
+            for line in proc.stdout:
+                lines.put(line)
+
+        reader = threading.Thread(target=read_stdout)
+        reader.daemon = True
+        reader.start()
+
+        def check_alive():
+            if proc.poll() is not None:
+                raise RuntimeError(f"main.py terminato con codice {proc.returncode}")
+
+        try:
+            forward_time = None
+            while forward_time is None:
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError("Nessun messaggio inoltrato a Resolume entro il timeout")
+                client.send_message("/bpm/master/current", 128.0)
+                try:
+                    resolume.recv(1024)
+                    forward_time = time.perf_counter() - start
+                except socket.timeout:
+                    check_alive()
+
+            client.send_message("/track/0/title", "Bench Title")
+            client.send_message("/track/0/artist", "Bench Artist")
+            while True:
+                remaining = timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    raise RuntimeError("Loop eventi Qt bloccato: nessuna ricerca copertina entro il timeout")
+                try:
+                    line = lines.get(timeout=min(remaining, 0.05))
+                except queue.Empty:
+                    check_alive()
+                    continue
+                if LIVENESS_MARKER in line:
+                    return forward_time, time.perf_counter() - start
+        finally:
+            proc.kill()
+            proc.wait()
+            resolume.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark di avvio a freddo")
+    parser.add_argument("--import-budget", type=float, default=0.5)
+    parser.add_argument("--forward-budget", type=float, default=0.3)
+    parser.add_argument("--live-budget", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    import_time = min(measure_import() for _ in range(args.runs))
+    startups = [measure_startup() for _ in range(args.runs)]
+    forward_time = min(forward for forward, _ in startups)
+    live_time = min(live for _, live in startups)
+
+    print(f"Import main.py:        {import_time * 1000:7.1f} ms (budget {args.import_budget * 1000:.0f} ms)")
+    print(f"Primo BPM a Resolume:  {forward_time * 1000:7.1f} ms (budget {args.forward_budget * 1000:.0f} ms)")
+    print(f"Loop Qt attivo:        {live_time * 1000:7.1f} ms (budget {args.live_budget * 1000:.0f} ms)")
+
+    if (import_time > args.import_budget or forward_time > args.forward_budget
+            or live_time > args.live_budget):
+        print("REGRESSIONE: budget di avvio superato.")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,21 @@
 # main.py (versione con logica di ricerca flessibile)
 
 import sys
-import time
-import requests
 import io
+import os
+import time
 import threading
 import configparser
-import base64
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QThread, pyqtSignal, QObject, QTimer, QRect
-from PyQt6.QtGui import QGuiApplication, QPixmap, QCursor
+from collections import OrderedDict
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QObject, QTimer, QRect
+from PyQt6.QtGui import QPixmap
 from pythonosc.dispatcher import Dispatcher
 from pythonosc.osc_server import BlockingOSCUDPServer
 from pythonosc.udp_client import SimpleUDPClient
 
-# Importa la tua UI
-from ui import FinestraOverlay, SettingsDialog
+# NOTA: PyQt6.QtWidgets, la UI (ui.py) e 'requests' vengono importati in modo
+# lazy: all'avvio il server OSC deve essere in ascolto (e l'inoltro verso
+# Resolume attivo) prima di costruire la finestra o lo stack HTTP.
 
 # --- GESTORE IMPOSTAZIONI ---
 class SettingsManager:
@@ -27,21 +27,35 @@ class SettingsManager:
                 'ip': '127.0.0.1',
                 'port': '7000',
                 'resolume_ip': '127.0.0.1',
-                'resolume_port': '7001'
+                'resolume_port': '7001',
+                # Titolo/artista/album arrivati a meno di tag_window_ms l'uno dall'altro
+                # formano un unico cambio traccia (al massimo tag_max_wait_ms in tutto)
+                'tag_window_ms': '150',
+                'tag_max_wait_ms': '600'
             },
             'osc_paths': {
                 'deck1_title': '/track/0/title',
                 'deck1_artist': '/track/0/artist',
                 'deck1_album': '/track/0/album',
                 'deck1_time': '/time/0',
+                'deck1_palette': '/companion/deck/0/palette',
                 'deck2_title': '/track/1/title',
                 'deck2_artist': '/track/1/artist',
                 'deck2_album': '/track/1/album',
                 'deck2_time': '/time/1',
+                'deck2_palette': '/companion/deck/1/palette',
                 'bpm': '/bpm/master/current',
                 'beat': '/beat/master',
                 'resolume_bpm': '/composition/tempocontroller/tempo'
             },
+            'artwork': {
+                # Endpoint HTTP locale: http://<ip>:<port>/deck1.jpg e /deck2.jpg
+                'http_enabled': '1',
+                'http_ip': '127.0.0.1',
+                'http_port': '7080',
+                # Cartella per deck1.jpg/deck2.jpg sostituiti in modo atomico (vuoto = disattivato)
+                'file_dir': ''
+            },
             'spotify': {
                 'client_id': 'IL_TUO_CLIENT_ID',
                 'client_secret': 'IL_TUO_CLIENT_SECRET'
@@ -50,10 +64,10 @@ class SettingsManager:
         self.load()
 
     def load(self):
+        changed = False
         if not self.config.read(self.filename):
             print("File config.ini non trovato. Creazione con valori predefiniti.")
-            self.config.read_dict(self.defaults)
-            self.save()
+            changed = True
         # Assicura che tutte le sezioni e chiavi predefinite esistano
         for section, keys in self.defaults.items():
             if not self.config.has_section(section):
@@ -61,7 +75,10 @@ class SettingsManager:
             for key, value in keys.items():
                 if not self.config.has_option(section, key):
                     self.config.set(section, key, value)
-        self.save() # Salva eventuali chiavi mancanti
+                    changed = True
+        # Riscrive il file solo se manca o se sono state aggiunte chiavi
+        if changed:
+            self.save()
 
     def get(self, section, key):
         return self.config.get(section, key, fallback=self.defaults.get(section, {}).get(key))
@@ -77,13 +94,300 @@ class SettingsManager:
         self.config.read_dict(settings_dict)
         self.save()
 
+# --- CIRCUIT BREAKER PER I PROVIDER DI COPERTINE ---
+class CircuitBreaker:
+    """
+    Tiene traccia della raggiungibilità di un provider.
+    'closed': richieste consentite. 'open': il provider è considerato
+    irraggiungibile e le ricerche falliscono subito, mentre un thread in
+    background lo sonda con backoff esponenziale. 'half_open': sonda in corso.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, probe, on_state_change=None,
+                 failure_threshold=3, initial_backoff=2.0, max_backoff=60.0):
+        self.name = name
+        self.probe = probe  # callable: True se il provider risponde
+        self.on_state_change = on_state_change
+        self.failure_threshold = failure_threshold
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.state = self.CLOSED
+        self.failures = 0
+        # Al massimo un thread di sonda attivo per provider
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            changed = self.state != self.CLOSED
+            self.state = self.CLOSED
+        if changed:
+            self._notify(self.CLOSED)
+
+    def record_failure(self, network_error=False):
+        """Un errore DNS/connessione apre subito il circuito, gli altri dopo N consecutivi."""
+        with self._lock:
+            self.failures += 1
+            if self.state != self.CLOSED:
+                return
+            if not network_error and self.failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            start_probe = not self._probing
+            self._probing = True
+        print(f"Provider '{self.name}' non raggiungibile: circuito aperto.")
+        self._notify(self.OPEN)
+        if start_probe:
+            thread = threading.Thread(target=self._probe_loop)
+            thread.daemon = True
+            thread.start()
+
+    def _probe_loop(self):
+        backoff = self.initial_backoff
+        while True:
+            time.sleep(backoff)
+            with self._lock:
+                # Chiuso nel frattempo da una richiesta andata a buon fine
+                if self.state == self.CLOSED:
+                    self._probing = False
+                    return
+                self.state = self.HALF_OPEN
+            self._notify(self.HALF_OPEN)
+            try:
+                ok = self.probe()
+            except Exception:
+                ok = False
+            with self._lock:
+                closed = ok or self.state == self.CLOSED
+                changed = self.state != self.CLOSED
+                if closed:
+                    self._probing = False
+                    self.state = self.CLOSED
+                    self.failures = 0
+                else:
+                    self.state = self.OPEN
+            if closed:
+                if changed:
+                    print(f"Provider '{self.name}' di nuovo raggiungibile.")
+                    self._notify(self.CLOSED)
+                return
+            self._notify(self.OPEN)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _notify(self, state):
+        if self.on_state_change:
+            self.on_state_change(self.name, state)
+
+# --- PALETTE DI COLORI DALLA COPERTINA ---
+def extract_palette(img_data, colors=5, size=64, iterations=8, min_distance=40.0, min_share=0.03):
+    """
+    Calcola i colori dominanti di una copertina con k-means vettorizzato
+    (NumPy) su una versione ridotta a size x size dell'immagine.
+    Centri più vicini di min_distance (distanza RGB) vengono uniti e i
+    cluster sotto min_share dei pixel scartati, così una copertina semplice
+    restituisce meno colori ma tutti distinti.
+    Restituisce una lista di tuple (r, g, b) 0-255, dalla più diffusa.
+    """
+    import numpy as np
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(img_data))
+    # Per i JPEG decodifica direttamente a risoluzione ridotta
+    img.draft('RGB', (size, size))
+    img = img.convert('RGB')
+    img.thumbnail((size, size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(img, dtype=np.float32).reshape(-1, 3)
+    if len(pixels) == 0:
+        return []
+    colors = min(colors, len(pixels))
+
+    # Inizializzazione deterministica: pixel equidistanti per luminosità
+    luma = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    order = np.argsort(luma)
+    centers = pixels[order[np.linspace(0, len(order) - 1, colors).astype(int)]]
+
+    def assign(centers):
+        # Distanze (N, k) di ogni pixel da ogni centro, tutte in un colpo
+        distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=pixels[:, c], minlength=len(centers)) for c in range(3)], axis=1)
+        return counts, sums
+
+    for _ in range(iterations):
+        counts, sums = assign(centers)
+        nonempty = counts > 0
+        new_centers = centers.copy()
+        new_centers[nonempty] = sums[nonempty] / counts[nonempty][:, None]
+        converged = np.allclose(new_centers, centers, atol=0.5)
+        centers = new_centers
+        if converged:
+            break
+
+    # Conteggi coerenti con i centri finali
+    counts, sums = assign(centers)
+
+    # Unione dei centri quasi uguali, dal cluster più grande al più piccolo
+    merged_counts, merged_sums = [], []
+    for i in np.argsort(-counts):
+        if counts[i] == 0:
+            continue
+        center = sums[i] / counts[i]
+        for j in range(len(merged_counts)):
+            if np.linalg.norm(merged_sums[j] / merged_counts[j] - center) < min_distance:
+                merged_counts[j] += counts[i]
+                merged_sums[j] = merged_sums[j] + sums[i]
+                break
+        else:
+            merged_counts.append(counts[i])
+            merged_sums.append(sums[i])
+
+    total = len(pixels)
+    palette = [
+        (count, tuple(int(round(v)) for v in total_sum / count))
+        for count, total_sum in zip(merged_counts, merged_sums)
+        if count >= min_share * total
+    ]
+    palette.sort(key=lambda item: -item[0])
+    return [color for _, color in palette]
+
+def to_jpeg(img_data, quality=90):
+    """Ricodifica in JPEG una copertina in altro formato (es. PNG). I JPEG restano invariati."""
+    if img_data[:2] == b'\xff\xd8':
+        return img_data
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(img_data)).convert('RGB')
+    out = io.BytesIO()
+    img.save(out, format='JPEG', quality=quality)
+    return out.getvalue()
+
+def placeholder_jpeg(size=600, color=(40, 40, 40)):
+    """Copertina neutra (stesso grigio della UI) da mostrare finché manca quella vera."""
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new('RGB', (size, size), color).save(out, format='JPEG', quality=90)
+    return out.getvalue()
+
 # --- CLASSE PER GESTIRE IL DOWNLOAD DELLE COPERTINE (ORA FLESSIBILE) ---
 class CoverDownloader(QObject):
     cover_ready = pyqtSignal(int, QPixmap, float)
-    
+    # Byte originali della copertina, emessi prima di cover_ready
+    artwork_ready = pyqtSignal(int, bytes)
+    # Emesso insieme a cover_ready: (deck, [(r, g, b), ...])
+    palette_ready = pyqtSignal(int, list)
+    provider_state_changed = pyqtSignal(str, str)
+    # Emesso dai thread delle sonde, gestito nel thread principale
+    _provider_recovered = pyqtSignal()
+
+    CACHE_SIZE = 256
+    PROBE_URLS = {
+        'itunes': "https://itunes.apple.com/",
+        'deezer': "https://api.deezer.com/",
+    }
+
     def __init__(self):
         super().__init__()
         self.last_track = {0: None, 1: None}
+        # Titolo caricato su ogni deck, aggiornato subito al cambio traccia
+        self.current_title = {}
+        self._current_lock = threading.Lock()
+        self._session = None
+        self._session_lock = threading.Lock()
+        # track_id -> (bytes immagine, durata, palette). Usata anche quando si è offline.
+        self.cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Tracce rimaste senza copertina perché tutti i provider erano offline
+        self.pending = {}
+        self._pending_lock = threading.Lock()
+        self.breakers = {
+            name: CircuitBreaker(name, lambda url=url: self._probe(url),
+                                 on_state_change=self._on_breaker_state)
+            for name, url in self.PROBE_URLS.items()
+        }
+        self._provider_recovered.connect(self._retry_pending)
+
+    def _on_breaker_state(self, name, state):
+        self.provider_state_changed.emit(name, state)
+        if state == CircuitBreaker.CLOSED:
+            self._provider_recovered.emit()
+
+    def _probe(self, url):
+        # Qualsiasi risposta HTTP indica che rete e DNS funzionano
+        self._http().head(url, timeout=2)
+        return True
+
+    def _is_network_error(self, exc):
+        import requests
+        return isinstance(exc, requests.exceptions.ConnectionError)
+
+    def _cache_get(self, track_id):
+        with self._cache_lock:
+            entry = self.cache.get(track_id)
+            if entry is not None:
+                self.cache.move_to_end(track_id)
+            return entry
+
+    def _cache_put(self, track_id, img_data, duration_seconds, palette):
+        with self._cache_lock:
+            self.cache[track_id] = (img_data, duration_seconds, palette)
+            self.cache.move_to_end(track_id)
+            while len(self.cache) > self.CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def track_changed(self, deck_number, title):
+        """Chiamato in modo diretto al cambio traccia, prima del segnaposto delle copertine."""
+        with self._current_lock:
+            self.current_title[deck_number] = title
+
+    def _is_current(self, deck_number, artist, title):
+        return (self.last_track.get(deck_number) == f"{artist}-{title}"
+                and self.current_title.get(deck_number, title) == title)
+
+    def _emit_cover(self, deck_number, artist, title, img_data, duration_seconds, palette):
+        # Un worker lento non deve sovrascrivere la copertina di una traccia successiva.
+        # Il lock con track_changed evita che il cambio avvenga tra controllo ed emissione.
+        with self._current_lock:
+            if not self._is_current(deck_number, artist, title):
+                print(f"Copertina di '{artist} - {title}' scartata: Deck {deck_number} ha cambiato traccia.")
+                return
+            self.artwork_ready.emit(deck_number, img_data)
+            pixmap = QPixmap()
+            pixmap.loadFromData(img_data)
+            self.cover_ready.emit(deck_number, pixmap, duration_seconds)
+            # Anche la palette: luci e visual devono seguire la traccia corrente
+            if palette:
+                self.palette_ready.emit(deck_number, palette)
+
+    def _set_pending(self, deck_number, artist, title, album):
+        with self._pending_lock:
+            # Dal worker: ignora se sul deck è già stata caricata un'altra traccia
+            if self.last_track.get(deck_number) == f"{artist}-{title}":
+                self.pending[deck_number] = (artist, title, album)
+
+    def _retry_pending(self):
+        with self._pending_lock:
+            pending, self.pending = self.pending, {}
+        for deck_number, (artist, title, album) in pending.items():
+            self.last_track[deck_number] = None
+            self.download_cover(deck_number, artist, title, album)
+
+    def _http(self):
+        """Crea la sessione HTTP alla prima ricerca (import di 'requests' incluso)."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    self._session = requests.Session()
+        return self._session
     
     def download_cover(self, deck_number, artist, title, album=None):
         # L'ID univoco si basa su artista e titolo, i dati minimi garantiti
@@ -91,6 +395,19 @@ class CoverDownloader(QObject):
         if not artist or not title or self.last_track.get(deck_number) == track_id:
             return
         self.last_track[deck_number] = track_id
+        with self._pending_lock:
+            self.pending.pop(deck_number, None)
+
+        cached = self._cache_get(track_id)
+        if cached is not None:
+            self._emit_cover(deck_number, artist, title, *cached)
+            return
+
+        # Offline: nessun thread, nessun timeout. Si riprova al ripristino.
+        if not any(breaker.allow() for breaker in self.breakers.values()):
+            print(f"Provider offline: copertina per Deck {deck_number} rimandata.")
+            self._set_pending(deck_number, artist, title, album)
+            return
         
         thread = threading.Thread(
             target=self._download_worker,
@@ -109,7 +426,7 @@ class CoverDownloader(QObject):
         params = {'term': search_query, 'media': 'music', 'entity': 'song', 'limit': 1}
         url = "https://itunes.apple.com/search"
         
-        response = requests.get(url, params=params, timeout=5)
+        response = self._http().get(url, params=params, timeout=5)
         response.raise_for_status()
         data = response.json()
 
@@ -132,7 +449,7 @@ class CoverDownloader(QObject):
         params = {'q': query, 'limit': 1}
         url = "https://api.deezer.com/search"
         
-        response = requests.get(url, params=params, timeout=5)
+        response = self._http().get(url, params=params, timeout=5)
         response.raise_for_status()
         data = response.json()
 
@@ -149,36 +466,254 @@ class CoverDownloader(QObject):
         return None, 0
 
     def _download_worker(self, deck_number, artist, title, album):
-        cover_url, duration_seconds = None, 0
-        try:
-            # 1. Prova con iTunes
-            cover_url, duration_seconds = self._search_itunes(artist, title, album)
-            
-            # 2. Se iTunes fallisce, prova con Deezer (fallback)
+        track_id = f"{artist}-{title}"
+        providers = [
+            ('itunes', self._search_itunes),
+            ('deezer', self._search_deezer),  # fallback
+        ]
+        for name, search in providers:
+            breaker = self.breakers[name]
+            if not breaker.allow():
+                continue
+
+            # 1. Cerca la traccia sul provider
+            try:
+                cover_url, duration_seconds = search(artist, title, album)
+            except Exception as e:
+                print(f"Errore durante la ricerca della copertina su {name}: {e}")
+                breaker.record_failure(self._is_network_error(e))
+                continue
+            breaker.record_success()
             if not cover_url:
-                cover_url, duration_seconds = self._search_deezer(artist, title, album)
-        
-        except Exception as e:
-            print(f"Errore durante la ricerca della copertina: {e}")
-        
-        # 3. Se abbiamo trovato una copertina, scaricala
+                continue
+
+            # 2. Se abbiamo trovato una copertina, scaricala
+            try:
+                img_response = self._http().get(cover_url, timeout=5)
+                img_response.raise_for_status()
+                img_data = img_response.content
+            except Exception as e:
+                print(f"Errore durante il download dell'immagine da {cover_url}: {e}")
+                breaker.record_failure(self._is_network_error(e))
+                continue
+
+            # Tutto in JPEG: URL e file fissi deckN.jpg devono corrispondere al contenuto
+            try:
+                img_data = to_jpeg(img_data)
+            except Exception as e:
+                print(f"Errore durante la conversione in JPEG della copertina: {e}")
+
+            # La palette si calcola una sola volta e resta in cache con l'immagine
+            try:
+                palette = extract_palette(img_data)
+            except Exception as e:
+                print(f"Errore durante il calcolo della palette: {e}")
+                palette = []
+
+            # In cache comunque: se la traccia torna sul deck non si riscarica
+            self._cache_put(track_id, img_data, duration_seconds, palette)
+            self._emit_cover(deck_number, artist, title, img_data, duration_seconds, palette)
+            return
+
+        # Tutti i provider sono andati offline durante la ricerca
+        if not any(breaker.allow() for breaker in self.breakers.values()):
+            self._set_pending(deck_number, artist, title, album)
+
+# --- SERVER DELLE COPERTINE PER RESOLUME ---
+class ArtworkServer:
+    """
+    Espone la copertina corrente di ogni deck a URL fissi
+    (http://ip:porta/deck1.jpg, /deck2.jpg) servendo direttamente i byte
+    della cache, senza decodifica né accessi al disco. Supporta ETag e
+    If-None-Match, così Resolume scarica di nuovo solo quando cambia traccia.
+    Opzionalmente scrive deck1.jpg/deck2.jpg in una cartella, sostituendoli
+    in modo atomico (os.replace) una sola volta per cambio copertina.
+    Al cambio di traccia il deck mostra subito un segnaposto, finché non
+    arriva la nuova copertina: mai la copertina della traccia precedente.
+    """
+    _placeholder = None
+
+    def __init__(self, settings_manager):
+        self.settings = settings_manager
+        self.enabled = self.settings.get('artwork', 'http_enabled').strip().lower() in ('1', 'true', 'yes', 'on')
+        self.ip = self.settings.get('artwork', 'http_ip')
+        self.port = int(self.settings.get('artwork', 'http_port'))
+        self.file_dir = self.settings.get('artwork', 'file_dir').strip()
+        # deck -> (memoryview dei byte JPEG, etag)
+        self.artwork = {}
+        # deck -> titolo della traccia caricata
+        self.titles = {}
+        self.server = None
+
+    def track_changed(self, deck, title):
+        """Nuova traccia sul deck: sostituisce subito la vecchia copertina."""
+        if title == self.titles.get(deck):
+            return
+        self.titles[deck] = title
+        if ArtworkServer._placeholder is None:
+            try:
+                ArtworkServer._placeholder = placeholder_jpeg()
+            except Exception as e:
+                print(f"Errore durante la creazione del segnaposto: {e}")
+                # Senza segnaposto URL e file spariscono fino alla nuova copertina
+                self.artwork.pop(deck, None)
+                if self.file_dir:
+                    try:
+                        os.remove(os.path.join(self.file_dir, f"deck{deck + 1}.jpg"))
+                    except OSError:
+                        pass
+                return
+        self.set_deck(deck, ArtworkServer._placeholder)
+
+    def set_deck(self, deck, img_data):
+        import hashlib
         try:
-            if not cover_url: return
-            img_response = requests.get(cover_url, timeout=5)
-            img_response.raise_for_status()
-            img_data = img_response.content
-            
-            pixmap = QPixmap()
-            pixmap.loadFromData(img_data)
-            self.cover_ready.emit(deck_number, pixmap, duration_seconds)
+            img_data = to_jpeg(img_data)
         except Exception as e:
-            print(f"Errore durante il download dell'immagine da {cover_url}: {e}")
+            print(f"Copertina del Deck {deck} non convertibile in JPEG: {e}")
+            return
+        etag = '"' + hashlib.blake2b(img_data, digest_size=12).hexdigest() + '"'
+        current = self.artwork.get(deck)
+        if current is not None and current[1] == etag:
+            return
+        # Sostituzione atomica del riferimento: le richieste in corso finiscono con la vecchia immagine
+        self.artwork[deck] = (memoryview(img_data), etag)
+        if self.file_dir:
+            self._write_file(deck, img_data)
+
+    def _write_file(self, deck, img_data):
+        import tempfile
+        try:
+            os.makedirs(self.file_dir, exist_ok=True)
+            target = os.path.join(self.file_dir, f"deck{deck + 1}.jpg")
+            fd, tmp_path = tempfile.mkstemp(dir=self.file_dir, prefix=f".deck{deck + 1}-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(img_data)
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print(f"Errore durante la scrittura della copertina del Deck {deck}: {e}")
+
+    def start(self):
+        if not self.enabled or self.server is not None:
+            return
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        artwork = self.artwork
+        decks = {f"/deck{deck + 1}.jpg": deck for deck in (0, 1)}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self._serve(send_body=False)
+
+            def do_GET(self):
+                self._serve(send_body=True)
+
+            def _serve(self, send_body):
+                deck = decks.get(self.path.split('?', 1)[0])
+                entry = artwork.get(deck) if deck is not None else None
+                if entry is None:
+                    self.send_error(404)
+                    return
+                data, etag = entry
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Resolume interroga spesso: niente log per ogni richiesta
+
+        try:
+            self.server = ThreadingHTTPServer((self.ip, self.port), Handler)
+        except OSError as e:
+            print(f"Impossibile avviare il server copertine su {self.ip}:{self.port}: {e}")
+            return
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        print(f"Copertine disponibili su http://{self.ip}:{self.port}/deck1.jpg e /deck2.jpg")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+# --- AGGREGATORE DEI TAG PER DECK ---
+class DeckUpdateAggregator:
+    """
+    Raccoglie i tag (titolo, artista, album) che Rekordbox invia come
+    messaggi separati. Ogni messaggio riavvia una finestra di 'window'
+    secondi (debounce), ma una raffica non dura mai più di 'max_wait'
+    secondi dal primo messaggio. Alla scadenza on_commit(deck, tags)
+    riceve tutti i tag arrivati nel frattempo, in un'unica chiamata.
+    """
+    def __init__(self, window, on_commit, max_wait=None):
+        self.window = window
+        self.max_wait = max_wait if max_wait is not None else window * 4
+        self.on_commit = on_commit
+        self.pending = {}
+        self.timers = {}
+        self.burst_start = {}
+        # Un timer già scattato ma superato da uno più recente viene ignorato
+        self.generation = {}
+        self._lock = threading.Lock()
+
+    def add(self, deck, field, value):
+        if self.window <= 0:
+            self.on_commit(deck, {field: value})
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.pending.setdefault(deck, {})[field] = value
+            start = self.burst_start.setdefault(deck, now)
+            delay = max(0.0, min(self.window, start + self.max_wait - now))
+            previous = self.timers.get(deck)
+            if previous is not None:
+                previous.cancel()
+            generation = self.generation.get(deck, 0) + 1
+            self.generation[deck] = generation
+            timer = threading.Timer(delay, self._commit, args=(deck, generation))
+            timer.daemon = True
+            self.timers[deck] = timer
+        timer.start()
+
+    def _commit(self, deck, generation):
+        with self._lock:
+            if self.generation.get(deck) != generation:
+                return
+            self.timers.pop(deck, None)
+            self.burst_start.pop(deck, None)
+            tags = self.pending.pop(deck, None)
+        if tags:
+            self.on_commit(deck, tags)
+
+    def cancel(self):
+        with self._lock:
+            for timer in self.timers.values():
+                timer.cancel()
+            self.timers.clear()
+            self.burst_start.clear()
+            self.pending.clear()
 
 # --- THREAD PER IL SERVER OSC ---
 class OSCServerThread(QObject):
-    deck_title_signal = pyqtSignal(int, str)
-    deck_artist_signal = pyqtSignal(int, str)
-    deck_album_signal = pyqtSignal(int, str)
+    # Un solo evento per cambio traccia: (deck, titolo, artista, album)
+    deck_track_signal = pyqtSignal(int, str, str, str)
     deck_time_signal = pyqtSignal(int, float)
     bpm_signal = pyqtSignal(float)
     beat_signal = pyqtSignal(int)
@@ -195,14 +730,25 @@ class OSCServerThread(QObject):
         resolume_port = int(self.settings.get('osc', 'resolume_port'))
         # Client OSC per inviare dati a Resolume (o altro)
         self.resolume_client = SimpleUDPClient(resolume_ip, resolume_port)
+        self.resolume_bpm_path = self.settings.get('osc_paths', 'resolume_bpm')
+        self.palette_paths = {
+            0: self.settings.get('osc_paths', 'deck1_palette'),
+            1: self.settings.get('osc_paths', 'deck2_palette')
+        }
         
         self.track_info = {
             0: {'title': '', 'artist': '', 'album': ''},
             1: {'title': '', 'artist': '', 'album': ''}
         }
         self.last_requested_track = {0: None, 1: None}
+        window = int(self.settings.get('osc', 'tag_window_ms')) / 1000.0
+        max_wait = int(self.settings.get('osc', 'tag_max_wait_ms')) / 1000.0
+        self.aggregator = DeckUpdateAggregator(window, self._commit_track_update, max_wait)
 
-    def run(self):
+    def bind(self):
+        """Apre il socket OSC. Chiamabile dal thread principale prima di run()."""
+        if self.server is not None:
+            return
         dispatcher = Dispatcher()
         paths = self.settings.get_section('osc_paths')
         
@@ -219,10 +765,16 @@ class OSCServerThread(QObject):
         
         self.server = BlockingOSCUDPServer((self.ip, self.port), dispatcher)
         print(f"Server OSC in ascolto su {self.ip}:{self.port}")
+
+    def run(self):
+        self.bind()
         self.server.serve_forever()
 
     def stop(self):
-        if self.server: self.server.shutdown()
+        self.aggregator.cancel()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
 
     # --- CONTROLLO CORRETTO PER DATI MINIMI (ARTISTA + TITOLO) ---
     def _check_and_request_cover(self, deck):
@@ -243,31 +795,42 @@ class OSCServerThread(QObject):
         self.request_cover.emit(deck, artist, title, info.get('album', ''))
         self.last_requested_track[deck] = current_track_id
 
-    def handle_title(self, deck, address, *args):
-        if not args: return
-        title = str(args[0])
-        if title != self.track_info[deck].get('title'):
+    def _commit_track_update(self, deck, tags):
+        """Applica una raffica di tag come un'unica transazione di cambio traccia."""
+        current = self.track_info[deck]
+        title = tags.get('title', current['title'])
+        if title != current['title']:
             print(f"Nuova traccia rilevata su Deck {deck}: '{title}'. Reset info.")
-            self.track_info[deck] = {'title': title, 'artist': '', 'album': ''}
+            # Nuova traccia: i tag non ricevuti nella raffica non valgono più
+            info = {'title': title, 'artist': '', 'album': ''}
             self.last_requested_track[deck] = None
-            self.deck_title_signal.emit(deck, title)
-            self.deck_artist_signal.emit(deck, "")
-            self.deck_album_signal.emit(deck, "")
+        else:
+            info = dict(current)
+        info.update(tags)
+        if info == current:
+            return
+        self.track_info[deck] = info
+        self.deck_track_signal.emit(deck, info['title'], info['artist'], info['album'])
         self._check_and_request_cover(deck)
 
+    def handle_title(self, deck, address, *args):
+        if not args: return
+        self.aggregator.add(deck, 'title', str(args[0]))
+
     def handle_artist(self, deck, address, *args):
         if not args: return
-        artist = str(args[0])
-        self.track_info[deck]['artist'] = artist
-        self.deck_artist_signal.emit(deck, artist)
-        self._check_and_request_cover(deck)
+        self.aggregator.add(deck, 'artist', str(args[0]))
 
     def handle_album(self, deck, address, *args):
         if not args: return
-        album = str(args[0])
-        self.track_info[deck]['album'] = album
-        self.deck_album_signal.emit(deck, album)
-        self._check_and_request_cover(deck)
+        self.aggregator.add(deck, 'album', str(args[0]))
+
+    def send_palette(self, deck, palette):
+        """Invia la palette a Resolume come lista piatta r, g, b normalizzati 0-1."""
+        path = self.palette_paths[deck]
+        values = [channel / 255.0 for color in palette for channel in color]
+        self.resolume_client.send_message(path, values)
+        print(f"Inoltrata palette Deck {deck} ({len(palette)} colori) su path {path}")
 
     def handle_time(self, deck, address, *args):
         if args: 
@@ -280,7 +843,7 @@ class OSCServerThread(QObject):
             # Emetti il segnale per aggiornare la UI
             self.bpm_signal.emit(bpm)
             # Inoltra il BPM a Resolume sulla porta 7001
-            resolume_path = self.settings.get('osc_paths', 'resolume_bpm')
+            resolume_path = self.resolume_bpm_path
             bpmr = (bpm -20 )*0.002083
             self.resolume_client.send_message(resolume_path, bpmr)
             print(f"Inoltrato BPM: {bpm} a {self.resolume_client.address}:{self.resolume_client.port} su path {resolume_path}")
@@ -289,35 +852,24 @@ class OSCServerThread(QObject):
 
 # --- FUNZIONE MAIN ---
 def main():
-    app = QApplication(sys.argv)
     settings_manager = SettingsManager()
 
-    finestra = FinestraOverlay()
-    HOT_ZONE_HEIGHT = 15
-    primary_screen = QGuiApplication.primaryScreen().geometry()
-    hot_zone = QRect(
-        primary_screen.x(), primary_screen.y(),
-        primary_screen.width(), HOT_ZONE_HEIGHT
-    )
-
-    def check_mouse_position():
-        if not finestra.isVisible() and hot_zone.contains(QCursor.pos()):
-            finestra.show()
-            finestra.raise_()
+    # --- AVVIO RAPIDO: socket OSC aperto prima di Qt Widgets e della UI ---
+    # I messaggi che arrivano nel frattempo restano nel buffer del socket.
+    osc_server = OSCServerThread(settings_manager)
+    osc_server.bind()
 
-    mouse_check_timer = QTimer()
-    mouse_check_timer.setInterval(100)
-    mouse_check_timer.timeout.connect(check_mouse_position)
-    mouse_check_timer.start()
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication(sys.argv)
 
     # --- GESTIONE THREAD OSC ---
     osc_thread = QThread()
-    osc_server = OSCServerThread(settings_manager)
     osc_server.moveToThread(osc_thread)
+    # Metodo legato a un oggetto spostato nel thread: run() gira nel thread OSC
+    osc_thread.started.connect(osc_server.run)
 
     def start_osc_server():
         if not osc_thread.isRunning():
-            osc_thread.started.connect(osc_server.run)
             osc_thread.start()
 
     def stop_osc_server():
@@ -331,46 +883,133 @@ def main():
         stop_osc_server()
         # Ricrea l'istanza del server con le nuove impostazioni
         nonlocal osc_server
+        osc_thread.started.disconnect(osc_server.run)
         osc_server = OSCServerThread(settings_manager)
+        osc_server.bind()
         osc_server.moveToThread(osc_thread)
+        osc_thread.started.connect(osc_server.run)
         connect_signals() # Riconnetti i segnali alla nuova istanza
         start_osc_server()
         print("Server OSC riavviato.")
 
-    # --- GESTIONE FINESTRA IMPOSTAZIONI ---
-    def open_settings():
-        # Crea un dizionario completo delle impostazioni attuali
-        current_settings = {
-            'osc': settings_manager.get_section('osc'),
-            'osc_paths': settings_manager.get_section('osc_paths'),
-            'spotify': settings_manager.get_section('spotify')
-        }
-        dialog = SettingsDialog(current_settings, finestra)
-        dialog.settings_saved.connect(on_settings_saved)
-        dialog.exec()
-
-    def on_settings_saved(new_settings):
-        settings_manager.update_from_dict(new_settings)
-        restart_osc_server()
-
     # --- COLLEGAMENTO SEGNALI ---
     cover_downloader = CoverDownloader()
+    # Server copertine (HTTP locale + file opzionali), creato prima dei segnali che lo usano
+    artwork_server = ArtworkServer(settings_manager)
+    finestra = None
+    # Ultima copertina per deck: serve se arriva prima che la UI sia pronta
+    last_covers = {}
+
+    def on_cover_ready(deck, pixmap, duration):
+        last_covers[deck] = (pixmap, duration)
+        if finestra is not None:
+            finestra.update_deck_cover(deck, pixmap, duration)
+
+    # Il thread OSC è occupato da serve_forever: l'invio della palette avviene
+    # nel thread che la emette, nello stesso istante di cover_ready.
+    def forward_palette(deck, palette):
+        osc_server.send_palette(deck, palette)
+
+    def forward_artwork(deck, img_data):
+        artwork_server.set_deck(deck, img_data)
+
+    def on_track_changed(deck, title, artist, album):
+        cover_downloader.track_changed(deck, title)
+        artwork_server.track_changed(deck, title)
+
     def connect_signals():
-        osc_server.deck_title_signal.connect(finestra.update_deck_title)
-        osc_server.deck_artist_signal.connect(finestra.update_deck_artist)
-        osc_server.deck_album_signal.connect(finestra.update_deck_album)
+        osc_server.request_cover.connect(cover_downloader.download_cover)
+        # Diretto: il segnaposto sostituisce la vecchia copertina prima di ogni altra cosa
+        osc_server.deck_track_signal.connect(on_track_changed, Qt.ConnectionType.DirectConnection)
+        if finestra is not None:
+            connect_ui_signals()
+
+    def connect_ui_signals():
+        osc_server.deck_track_signal.connect(finestra.update_deck_track)
         osc_server.deck_time_signal.connect(finestra.update_deck_time)
         osc_server.bpm_signal.connect(finestra.update_bpm)
         osc_server.beat_signal.connect(finestra.update_beat)
-        osc_server.request_cover.connect(cover_downloader.download_cover)
-    
+
     connect_signals()
-    cover_downloader.cover_ready.connect(finestra.update_deck_cover)
-    finestra.open_settings_requested.connect(open_settings)
-    
+    cover_downloader.cover_ready.connect(on_cover_ready)
+    cover_downloader.palette_ready.connect(forward_palette, Qt.ConnectionType.DirectConnection)
+    cover_downloader.artwork_ready.connect(forward_artwork, Qt.ConnectionType.DirectConnection)
+
     start_osc_server()
     app.aboutToQuit.connect(stop_osc_server)
+
+    # Avviato dopo il server OSC per non rallentarne l'avvio
+    artwork_server.start()
+
+    def restart_artwork_server():
+        nonlocal artwork_server
+        previous = artwork_server
+        previous.stop()
+        artwork_server = ArtworkServer(settings_manager)
+        artwork_server.titles = dict(previous.titles)
+        for deck, (data, _) in previous.artwork.items():
+            artwork_server.set_deck(deck, data.obj)
+        artwork_server.start()
+
+    app.aboutToQuit.connect(lambda: artwork_server.stop())
+
+    # --- COSTRUZIONE DIFFERITA DELLA UI ---
+    def build_ui():
+        nonlocal finestra
+        from PyQt6.QtGui import QGuiApplication, QCursor
+        from ui import FinestraOverlay, SettingsDialog
+
+        finestra = FinestraOverlay()
+        HOT_ZONE_HEIGHT = 15
+        primary_screen = QGuiApplication.primaryScreen().geometry()
+        hot_zone = QRect(
+            primary_screen.x(), primary_screen.y(),
+            primary_screen.width(), HOT_ZONE_HEIGHT
+        )
+
+        def check_mouse_position():
+            if not finestra.isVisible() and hot_zone.contains(QCursor.pos()):
+                finestra.show()
+                finestra.raise_()
+
+        mouse_check_timer = QTimer(finestra)
+        mouse_check_timer.setInterval(100)
+        mouse_check_timer.timeout.connect(check_mouse_position)
+        mouse_check_timer.start()
+
+        # --- GESTIONE FINESTRA IMPOSTAZIONI ---
+        def open_settings():
+            # Crea un dizionario completo delle impostazioni attuali
+            current_settings = {
+                'osc': settings_manager.get_section('osc'),
+                'osc_paths': settings_manager.get_section('osc_paths'),
+                'artwork': settings_manager.get_section('artwork'),
+                'spotify': settings_manager.get_section('spotify')
+            }
+            dialog = SettingsDialog(current_settings, finestra)
+            dialog.settings_saved.connect(on_settings_saved)
+            dialog.exec()
+
+        def on_settings_saved(new_settings):
+            settings_manager.update_from_dict(new_settings)
+            restart_osc_server()
+            restart_artwork_server()
+
+        # Prima collega i segnali, poi applica lo stato già ricevuto:
+        # gli eventi in coda verranno processati dopo, senza perdite.
+        connect_ui_signals()
+        finestra.open_settings_requested.connect(open_settings)
+        for deck, info in list(osc_server.track_info.items()):
+            if info['title']:
+                finestra.update_deck_track(deck, info['title'], info['artist'], info['album'])
+        for deck, (pixmap, duration) in last_covers.items():
+            finestra.update_deck_cover(deck, pixmap, duration)
+        cover_downloader.provider_state_changed.connect(finestra.update_provider_state)
+        for name, breaker in cover_downloader.breakers.items():
+            finestra.update_provider_state(name, breaker.state)
+
+    QTimer.singleShot(0, build_ui)
     sys.exit(app.exec())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -21,6 +21,8 @@ class FinestraOverlay(QWidget):
             0: {'current_time': -1, 'duration': 0, 'title': '', 'artist': '', 'album': ''},
             1: {'current_time': -1, 'duration': 0, 'title': '', 'artist': '', 'album': ''}
         }
+        # Stato dei provider di copertine ('closed' = raggiungibile)
+        self.provider_states = {}
         
         # Timer per aggiornare il tempo rimanente
         self.time_timer = QTimer()
@@ -112,10 +114,14 @@ class FinestraOverlay(QWidget):
         self.centrale_bpm = QLabel("--- BPM")
         self.centrale_beat = QLabel("")
         self.centrale_status = CircleLabel(size=20, color=QColor(255, 60, 60))
+        self.centrale_rete = QLabel("")
 
 
         self.centrale_bpm.setObjectName("bpm_label")
         self.centrale_beat.setObjectName("beat_label")
+        self.centrale_rete.setObjectName("network_label")
+        self.centrale_rete.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.centrale_rete.hide()
         self.centrale_bpm.setMinimumWidth(150)
         self.centrale_bpm.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.centrale_beat.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -125,6 +131,7 @@ class FinestraOverlay(QWidget):
         self.centrale.addWidget(self.centrale_bpm)
         self.centrale.addWidget(self.centrale_beat)
         self.centrale.addWidget(self.centrale_status, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.centrale.addWidget(self.centrale_rete)
         self.layout_principale.addLayout(self.centrale)
         
     def setup_secondo_deck(self):
@@ -224,29 +231,20 @@ class FinestraOverlay(QWidget):
                 self.secondo_durata.setText(current_time_str)
                 self.secondo_fine.setText(remaining_time_str)
 
-    @pyqtSlot(int, str)
-    def update_deck_title(self, deck, title):
-        self.track_data[deck]['title'] = title
-        if deck == 0:
-            self.primo_titolo.setText(title if title else "In attesa...")
-        else:
-            self.secondo_titolo.setText(title if title else "In attesa...")
-        
-        # Reset dei dati temporali quando cambia la traccia
-        self.track_data[deck]['current_time'] = -1
-        self.track_data[deck]['duration'] = 0
-
-    @pyqtSlot(int, str)
-    def update_deck_artist(self, deck, artist):
-        self.track_data[deck]['artist'] = artist
-        if deck == 0:
-            self.primo_artista.setText(artist)
-        else:
-            self.secondo_artista.setText(artist)
-
-    @pyqtSlot(int, str)
-    def update_deck_album(self, deck, album):
-        self.track_data[deck]['album'] = album
+    @pyqtSlot(int, str, str, str)
+    def update_deck_track(self, deck, title, artist, album):
+        """Aggiorna titolo, artista e album di un deck in un solo passaggio."""
+        if title != self.track_data[deck]['title']:
+            # Reset dei dati temporali quando cambia la traccia
+            self.track_data[deck]['current_time'] = -1
+            self.track_data[deck]['duration'] = 0
+        self.track_data[deck].update({'title': title, 'artist': artist, 'album': album})
+
+        titolo, artista = (self.primo_titolo, self.primo_artista) if deck == 0 else (self.secondo_titolo, self.secondo_artista)
+        self.setUpdatesEnabled(False)
+        titolo.setText(title if title else "In attesa...")
+        artista.setText(artist)
+        self.setUpdatesEnabled(True)
 
     @pyqtSlot(int, float)
     def update_deck_time(self, deck, current_time):
@@ -267,6 +265,19 @@ class FinestraOverlay(QWidget):
             else:
                 self.secondo_immagine.setPixmap(pixmap_scaled)
 
+    @pyqtSlot(str, str)
+    def update_provider_state(self, provider, state):
+        self.provider_states[provider] = state
+        offline = [name for name, s in self.provider_states.items() if s != 'closed']
+        if not offline:
+            self.centrale_rete.hide()
+        elif len(offline) == len(self.provider_states):
+            self.centrale_rete.setText("OFFLINE")
+            self.centrale_rete.show()
+        else:
+            self.centrale_rete.setText(f"{', '.join(offline)} offline")
+            self.centrale_rete.show()
+
     @pyqtSlot(float)
     def update_bpm(self, bpm):
         self.centrale_bpm.setText(f"{bpm:.1f} BPM")
@@ -346,6 +357,13 @@ class SettingsDialog(QDialog):
         for key in self.settings.get('osc_paths', {}):
             self.add_setting_row(form_layout, "osc_paths", key, f"Path: {key}")
 
+        # Sezione Copertine per Resolume
+        form_layout.addRow(self.create_section_label("Copertine per Resolume"))
+        self.add_setting_row(form_layout, "artwork", "http_enabled", "Server HTTP attivo (1/0)")
+        self.add_setting_row(form_layout, "artwork", "http_ip", "Indirizzo IP")
+        self.add_setting_row(form_layout, "artwork", "http_port", "Porta")
+        self.add_setting_row(form_layout, "artwork", "file_dir", "Cartella file (opzionale)")
+
         # Sezione Spotify
         form_layout.addRow(self.create_section_label("Spotify API"))
         self.add_setting_row(form_layout, "spotify", "client_id", "Client ID")